@@ -0,0 +1,109 @@
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+
+class RWLock:
+    """
+    writer-preferring readers-writer lock for the event loop:
+    any number of readers share the layer, a writer waits for them to drain
+    and blocks new readers while it is queued
+    """
+
+    def __init__(self):
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+
+    @asynccontextmanager
+    async def read(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: not self._writing and not self._writers_waiting)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+
+    @asynccontextmanager
+    async def write(self):
+        async with self._cond:
+            self._writers_waiting += 1
+            try:
+                await self._cond.wait_for(lambda: not self._writing and not self._readers)
+            finally:
+                self._writers_waiting -= 1
+                # a cancelled writer may be the only thing holding readers back
+                self._cond.notify_all()
+            self._writing = True
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+async def get_gis(request: Request):
+    """
+    yield the GISManager owned by this worker (created in the app lifespan)
+    while holding the layer read lock, so reads run concurrently with each other
+    """
+    async with request.app.state.gis_lock.read():
+        yield request.app.state.gis
+
+
+async def get_gis_for_write(request: Request):
+    """
+    yield the GISManager while holding the layer write lock,
+    so edits are serialized and never overlap a read
+    """
+    async with request.app.state.gis_lock.write():
+        yield request.app.state.gis
+
+
+# model -> body dependency, so each validator is compiled once per process
+_BODY_PARSERS: dict = {}
+
+
+def json_body(model):
+    """
+    dependency that validates the raw request body straight into `model`,
+    so the json is parsed once by pydantic-core instead of json.loads + validation
+    args:
+        model: pydantic model of the request body
+    """
+    parser = _BODY_PARSERS.get(model)
+    if parser is not None:
+        return parser
+
+    adapter = TypeAdapter(model)
+
+    async def _parse(request: Request):
+        try:
+            return adapter.validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+
+    _BODY_PARSERS[model] = _parse
+    return _parse
+
+
+def json_body_openapi(model) -> dict:
+    """
+    openapi_extra documenting a body read through json_body(model)
+    """
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}}
+        }
+    }
@@ -1,81 +1,218 @@
 import asyncio
-from sqlalchemy.dialects.postgresql import JSONB
-from geoalchemy2 import Geometry
-from fastapi import APIRouter, HTTPException, UploadFile, File, Query
-from fastapi.responses import JSONResponse
+import anyio
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Header, Depends, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from app.core.gis_manager import GISManager
-from app.schemas.feature_schemas import (FeatureCreate,FeatureUpdate,BufferRequest,GeometryRequest,UnionRequest,SimplifyRequest,DissolveRequest)
-from app.config import DATA_DIR
+from app.api.deps import get_gis, get_gis_for_write, json_body, json_body_openapi
+from app.schemas.feature_schemas import (FeatureCreate,FeatureUpdate,BatchOps,BufferRequest,GeometryRequest,UnionRequest,SimplifyRequest,DissolveRequest,
+                                         UploadResponse,FeatureResponse,BatchResponse)
+from app.schemas.analysis_schemas import BufferResponse, SimplifyResponse, DissolveResponse
+from app.core.geometry_utils import validate_geometries
+from app.config import DATA_DIR, MAX_UPLOAD_BYTES
 import os
-import json
-from shapely.geometry import mapping
+import io
+import shutil
+from pathlib import Path
+import shapely
 import geopandas as gpd
-from shapely.validation import make_valid
-import math
+import hashlib
+import orjson
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyproj import CRS
 
-feature_router = APIRouter(prefix="/feature", tags=["Feature Editing"])
-analysis_router = APIRouter(prefix="/analysis", tags=["Spatial Analysis"])
+feature_router = APIRouter(prefix="/feature", tags=["Feature Editing"], default_response_class=ORJSONResponse)
+analysis_router = APIRouter(prefix="/analysis", tags=["Spatial Analysis"], default_response_class=ORJSONResponse)
 
-gis = GISManager()
+# caps concurrent GEOS / serialization work pushed off the event loop
+_CPU_LIMITER = anyio.CapacityLimiter(os.cpu_count() or 4)
+
+_ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+_DATA_DIR = Path(DATA_DIR)
+
+_ALLOWED = frozenset({".geojson", ".shp", ".gpkg", ".fgb", ".parquet"})
+
+_WGS84 = CRS.from_epsg(4326)
+
+# uploads up to this size are parsed from memory instead of a temp file
+_IN_MEMORY_UPLOAD_MAX = 64 << 20
+
+
+def _gdf_stream(gdf):
+    """
+    yield a GeoDataFrame as geojson FeatureCollection bytes, feature by feature
+    """
+    yield b'{"type":"FeatureCollection","features":['
+    for i, feature in enumerate(gdf.iterfeatures(na="drop")):
+        if i:
+            yield b","
+        yield orjson.dumps(feature, option=orjson.OPT_SERIALIZE_NUMPY)
+    yield b"]}"
+
+
+def _ndjson_stream(gdf):
+    """
+    yield a GeoDataFrame as newline-delimited geojson features;
+    each geometry is written by GEOS (shapely.to_geojson) and spliced in as raw json
+    """
+    columns = [c for c in gdf.columns if c != gdf.geometry.name]
+    geoms = np.asarray(gdf.geometry.values)
+    for geom, row in zip(geoms, gdf[columns].itertuples(index=False, name=None)):
+        geometry = shapely.to_geojson(geom).encode() if geom is not None else b"null"
+        yield _splice_json({"type": "Feature", "properties": dict(zip(columns, row))}, geometry=geometry) + b"\n"
+
+
+async def _run_cpu(func, *args):
+    """
+    run blocking GEOS / GDAL / serialization work in a worker thread
+    """
+    return await anyio.to_thread.run_sync(func, *args, limiter=_CPU_LIMITER)
+
+
+def _splice_json(payload: dict, **fragments: bytes) -> bytes:
+    """
+    orjson-encode payload and append already serialized json values under the given keys
+    args:
+        payload (dict): plain fields of the response (status, operation, counts ...)
+        fragments (bytes): raw json values, e.g. geojson written by geopandas / GEOS
+    """
+    parts = [orjson.dumps(payload)[:-1]]
+    for key, raw in fragments.items():
+        parts += [b',"', key.encode(), b'":', raw]
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+def _arrow_stream(payload: dict, gdf) -> bytes:
+    """
+    encode gdf as an arrow IPC stream with geoarrow WKB geometry;
+    payload goes into the schema metadata and dict / list columns are written as json text
+    """
+    gdf = gdf.copy()
+    for col in gdf.columns:
+        if col != gdf.geometry.name and gdf[col].dtype == object:
+            gdf[col] = gdf[col].map(lambda v: orjson.dumps(v).decode() if isinstance(v, (dict, list)) else v)
+
+    table = pa.table(gdf.to_arrow(index=False, geometry_encoding="WKB"))
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"response": orjson.dumps(payload)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+async def _features_response(payload: dict, gdf, accept: str | None = None) -> Response:
+    """
+    build a json response that embeds gdf.to_json() as "features" without re-parsing it,
+    or an arrow IPC stream when the client accepts application/vnd.apache.arrow.stream
+    """
+    if accept and _ARROW_STREAM in accept:
+        return Response(await _run_cpu(_arrow_stream, payload, gdf), media_type=_ARROW_STREAM)
+
+    def _body():
+        return _splice_json(payload, features=gdf.to_json().encode())
+
+    return Response(await _run_cpu(_body), media_type="application/json")
+
+
+async def _save_upload(file: UploadFile, path: Path):
+    """
+    copy an uploaded file to disk in 1 MiB chunks, in one worker thread hop
+    """
+    def _copy():
+        file.file.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(file.file, f, 1 << 20)
+
+    await anyio.to_thread.run_sync(_copy)
+
+
+def _read_vector(source, ext: str = None):
+    """
+    read a vector file (path or file-like); GeoParquet goes straight through pyarrow,
+    everything else through pyogrio's arrow path so GDAL hands back WKB arrays
+    instead of per-feature python objects
+    """
+    if ext == ".parquet":
+        return gpd.read_parquet(source)
+    return gpd.read_file(source, engine="pyogrio", use_arrow=True)
+
+
+def _upload_path(filename: str) -> Path:
+    """
+    staging path for an upload; only the base name is kept so "../" cannot escape DATA_DIR
+    """
+    return _DATA_DIR / Path(filename).name
+
+
+async def _read_upload(file: UploadFile, path: Path):
+    """
+    parse an uploaded vector file into a GeoDataFrame;
+    small uploads go to GDAL from memory (/vsimem/), larger ones are streamed to disk first
+    """
+    ext = path.suffix.lower()
+    if file.size is not None and file.size <= _IN_MEMORY_UPLOAD_MAX:
+        data = await file.read()
+        return await _run_cpu(_read_vector, io.BytesIO(data), ext)
+
+    await _save_upload(file, path)
+    try:
+        return await _run_cpu(_read_vector, path, ext)
+    finally:
+        os.remove(path)
 
 
 # ==>> features endpoints
 
-@feature_router.post("/upload")
-async def upload_dataset(file: UploadFile = File(...)):
+@feature_router.post("/upload", response_model=UploadResponse)
+async def upload_dataset(request: Request, file: UploadFile = File(...), gis: GISManager = Depends(get_gis_for_write)):
     try:
-        allowed = [".geojson", ".shp"]
-        _, ext = os.path.splitext(file.filename.lower())
-        if ext not in allowed:
-            raise HTTPException(status_code=400, detail="Only GeoJSON or Shapefile formats are allowed.")
+        if int(request.headers.get("content-length", 0)) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes.")
 
-        path = os.path.join(DATA_DIR, file.filename)
-        with open(path, "wb") as f:
-            f.write(await file.read())
+        path = _upload_path(file.filename)
+        if path.suffix.lower() not in _ALLOWED:
+            raise HTTPException(status_code=400, detail="Only GeoJSON, Shapefile, GeoPackage, FlatGeobuf or GeoParquet formats are allowed.")
 
-        gdf = gpd.read_file(path)
+        gdf = await _read_upload(file, path)
         if gdf.empty:
             raise HTTPException(status_code=400, detail="The uploaded file is empty or invalid.")
 
-        if gdf.crs is None or gdf.crs.to_epsg() != 4326:
-            gdf = gdf.set_crs(epsg=4326, allow_override=True)
-
-        gdf["properties"] = gdf.drop(columns=["geometry"]).apply(lambda x: x.to_dict(), axis=1)
-
-        await gis.load_from_db()
-        max_id = gis.gdf["feature_id"].max() + 1 if not gis.gdf.empty else 1
+        # crs equality is a cheap object compare (to_epsg() searches the PROJ database);
+        # data in another crs is reprojected in one array pass rather than relabelled
+        if gdf.crs is None:
+            gdf = gdf.set_crs(epsg=4326)
+        elif gdf.crs != _WGS84:
+            gdf = await _run_cpu(lambda g: g.to_crs(_WGS84), gdf)
 
-        gdf.insert(0, "feature_id", range(int(max_id), int(max_id) + len(gdf)))
-        gdf = gdf[["feature_id", "properties", "geometry"]]
+        geoms = np.array(gdf.geometry.values, dtype=object)
+        gdf["geometry"] = await _run_cpu(validate_geometries, geoms, True)
 
-        def clean_json(obj):
-            for k, v in obj.items():
-                if isinstance(v, float) and math.isnan(v):
-                    obj[k] = None
-            return json.dumps(obj)
+        def _properties():
+            attrs = gdf.drop(columns=["geometry"]).astype(object)
+            attrs = attrs.where(attrs.notna(), None)
+            return [orjson.dumps(r, option=orjson.OPT_SERIALIZE_NUMPY).decode() for r in attrs.to_dict(orient="records")]
 
-        gdf["properties"] = gdf["properties"].apply(clean_json)
+        gdf["properties"] = await _run_cpu(_properties)
 
-        gdf.to_postgis(
-            name=gis.features_table,
-            con=gis.sync_engine,
-            if_exists="append",
-            index=False,
-            dtype={"geometry": Geometry("GEOMETRY", srid=4326), "properties": JSONB()}
-        )
+        gdf.insert(0, "feature_id", await gis.reserve_feature_ids(len(gdf)))
+        gdf = gdf[["feature_id", "properties", "geometry"]]
 
-        if os.path.exists(path):
-            os.remove(path)
+        await gis.copy_features(gdf)
 
-        return {"status": "success", "count": len(gdf), "message": "Dataset uploaded successfully."}
+        return UploadResponse(count=len(gdf))
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
-@feature_router.post("/add")
-async def add_feature(data: FeatureCreate):
+@feature_router.post("/add", response_model=FeatureResponse, openapi_extra=json_body_openapi(FeatureCreate))
+async def add_feature(data: FeatureCreate = Depends(json_body(FeatureCreate)), gis: GISManager = Depends(get_gis_for_write)):
     """
     add a new feature
     args:
@@ -89,13 +226,35 @@ async def add_feature(data: FeatureCreate):
             data.properties,
             fix_topology=data.fix_topology
         )
-        return {"status": "success", "feature_id": feature_id}
+        return FeatureResponse(feature_id=feature_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Add feature failed: {str(e)}")
 
 
-@feature_router.put("/{feature_id}/update")
-async def update_feature(feature_id: int, data: FeatureUpdate):
+@feature_router.post("/batch", response_model=BatchResponse, openapi_extra=json_body_openapi(BatchOps))
+async def batch_features(data: BatchOps = Depends(json_body(BatchOps)), gis: GISManager = Depends(get_gis_for_write)):
+    """
+    add, update and delete many features in one request
+    args:
+        data (BatchOps): adds, updates (with feature_id) and deletes (feature ids)
+    returns:
+        dict: status, ids of added features, updated and deleted counts
+    """
+    try:
+        result = await gis.batch_apply(
+            adds=[a.model_dump() for a in data.adds],
+            updates=[u.model_dump() for u in data.updates],
+            deletes=data.deletes
+        )
+        return BatchResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch edit failed: {str(e)}")
+
+
+@feature_router.put("/{feature_id}/update", response_model=FeatureResponse, openapi_extra=json_body_openapi(FeatureUpdate))
+async def update_feature(feature_id: int, data: FeatureUpdate = Depends(json_body(FeatureUpdate)), gis: GISManager = Depends(get_gis_for_write)):
     """
     update an existing feature
     args:
@@ -111,15 +270,15 @@ async def update_feature(feature_id: int, data: FeatureUpdate):
             new_properties=data.properties,
             fix_topology=data.fix_topology
         )
-        return {"status": "success", "feature_id": updated_id}
+        return FeatureResponse(feature_id=updated_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Update feature failed: {str(e)}")
 
 
-@feature_router.delete("/{feature_id}/delete")
-async def delete_feature(feature_id: int):
+@feature_router.delete("/{feature_id}/delete", response_model=FeatureResponse)
+async def delete_feature(feature_id: int, gis: GISManager = Depends(get_gis_for_write)):
     """
     delete a feature by id
     args:
@@ -131,152 +290,173 @@ async def delete_feature(feature_id: int):
         deleted = await gis.delete_feature(feature_id)
         if not deleted:
             raise HTTPException(status_code=404, detail="Feature not found")
-        return {"status": "success", "feature_id": feature_id}
+        return FeatureResponse(feature_id=feature_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
 
 
 @feature_router.get("/show")
-def show_features():
+async def show_features(
+    if_none_match: str | None = Header(default=None),
+    accept: str | None = Header(default=None),
+    gis: GISManager = Depends(get_gis)
+):
     """
+    serialized geojson is cached until the dataset changes (gis._epoch)
+    args:
+        if_none_match (str, optional): etag from a previous response
+        accept (str, optional): application/x-ndjson streams one feature per line instead
     return:
-        JSONResponse: all features as geojson
+        Response: all features as geojson, or 304 if the etag still matches
     """
     try:
-        geojson = json.loads(gis.gdf.to_json())
-        return JSONResponse(content=geojson)
+        await gis.load_from_db()
+        if accept and "application/x-ndjson" in accept:
+            return StreamingResponse(_ndjson_stream(gis.gdf), media_type="application/x-ndjson")
+
+        key = (id(gis.gdf), gis._epoch)
+        if gis._show_cache is None or gis._show_cache[:2] != key:
+            body = await _run_cpu(lambda gdf: b"".join(_gdf_stream(gdf)), gis.gdf)
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            gis._show_cache = (*key, body, etag)
+
+        body, etag = gis._show_cache[2:]
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type="application/geo+json", headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load features: {str(e)}")
 
 
 # ==>> spatial analysis endpoints
 
-@analysis_router.post("/buffer")
-async def buffer_operation(data: BufferRequest):
+@analysis_router.post("/buffer", response_model=BufferResponse, openapi_extra=json_body_openapi(BufferRequest))
+async def buffer_operation(data: BufferRequest = Depends(json_body(BufferRequest)), gis: GISManager = Depends(get_gis)):
     try:
-        result_id, _ = await gis.buffer(
+        result_id, count = await gis.buffer(
             distance=data.distance,
             feature_id=data.feature_id
         )
-        return {
-            "status": "success",
-            "operation": "buffer",
-            "distance": data.distance,
-            "feature_id": data.feature_id,
-            "result_id": result_id,
-        }
+        return BufferResponse(distance=data.distance, feature_id=data.feature_id, result_id=result_id, count=count)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Buffer operation failed: {str(e)}")
 
 
-@analysis_router.post("/intersect")
-async def intersect_operation(data: GeometryRequest):
+@analysis_router.post("/intersect", openapi_extra=json_body_openapi(GeometryRequest))
+async def intersect_operation(data: GeometryRequest = Depends(json_body(GeometryRequest)), accept: str | None = Header(default=None), gis: GISManager = Depends(get_gis)):
     try:
         intersected = await gis.intersect(data.geometry)
-        return {
+        return await _features_response({
             "status": "success",
             "operation": "intersect",
-            "count": len(intersected),
-            "features": json.loads(intersected.to_json())
-        }
+            "count": len(intersected)
+        }, intersected, accept)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Intersect operation failed: {str(e)}")
 
 
-@analysis_router.post("/clip")
-async def clip_operation(data: GeometryRequest):
+@analysis_router.post("/clip", openapi_extra=json_body_openapi(GeometryRequest))
+async def clip_operation(data: GeometryRequest = Depends(json_body(GeometryRequest)), accept: str | None = Header(default=None), gis: GISManager = Depends(get_gis)):
     try:
         table_name, clipped = await gis.clip(data.geometry)
-        return {
+        return await _features_response({
             "status": "success",
             "operation": "clip",
-            "features": json.loads(clipped.to_json()),
             "count": len(clipped)
-        }
+        }, clipped, accept)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Clip operation failed: {str(e)}")
 
 
-@analysis_router.post("/nearest")
-async def nearest_operation(data: GeometryRequest):
+@analysis_router.post("/nearest", openapi_extra=json_body_openapi(GeometryRequest))
+async def nearest_operation(data: GeometryRequest = Depends(json_body(GeometryRequest)), gis: GISManager = Depends(get_gis)):
     try:
         result = await gis.nearest_neighbor(data.geometry)
         if result is None:
             raise HTTPException(status_code=404, detail="No features found for nearest neighbor")
-        return {
-            "status": "success",
-            "operation": "nearest",
-            "result": result
-        }
+        def _body():
+            geometry = result.pop("geometry")
+            nearest = _splice_json(result, geometry=shapely.to_geojson(geometry).encode())
+            return _splice_json({"status": "success", "operation": "nearest"}, result=nearest)
+
+        return Response(await _run_cpu(_body), media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Nearest operation failed: {str(e)}")
 
 
 @analysis_router.post("/spatial-join")
-async def spatial_join_endpoint(other_file: UploadFile = File(...)):
+async def spatial_join_endpoint(other_file: UploadFile = File(...), accept: str | None = Header(default=None), gis: GISManager = Depends(get_gis)):
     try:
-        path = os.path.join(DATA_DIR, other_file.filename)
-        content = other_file.file.read()
-        with open(path, "wb") as f:
-            f.write(content)
-
-        other_gdf = gpd.read_file(path)
+        path = _upload_path(other_file.filename)
+        other_gdf = await _read_upload(other_file, path)
         joined = await gis.spatial_join(other_gdf)
 
-        return {
+        return await _features_response({
             "status": "success",
             "operation": "spatial_join",
-            "joined_count": len(joined),
-            "features": json.loads(joined.to_json())
-        }
+            "joined_count": len(joined)
+        }, joined, accept)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Spatial join failed: {str(e)}")
 
 
-@analysis_router.post("/union")
-async def union_operation(data: UnionRequest):
+@analysis_router.post("/union", openapi_extra=json_body_openapi(UnionRequest))
+async def union_operation(data: UnionRequest = Depends(json_body(UnionRequest)), gis: GISManager = Depends(get_gis)):
     try:
-        union_geom = await gis.union(feature_ids=data.feature_ids)
+        union_geom = await gis.union(feature_ids=data.feature_ids, coverage=data.coverage)
         if union_geom is None:
             raise HTTPException(status_code=400, detail="No features to union")
-        return {
+        body = await _run_cpu(lambda: _splice_json({
             "status": "success",
             "operation": "union",
             "feature_ids": data.feature_ids,
-            "geometry_type": union_geom.geom_type,
-            "result_geometry": mapping(union_geom)
-        }
+            "geometry_type": union_geom.geom_type
+        }, result_geometry=shapely.to_geojson(union_geom).encode()))
+        return Response(body, media_type="application/json")
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Union operation failed: {str(e)}")
 
 
-@analysis_router.post("/simplify")
-async def simplify_operation(data: SimplifyRequest):
+@analysis_router.post("/simplify", response_model=SimplifyResponse, openapi_extra=json_body_openapi(SimplifyRequest))
+async def simplify_operation(data: SimplifyRequest = Depends(json_body(SimplifyRequest)), gis: GISManager = Depends(get_gis)):
     try:
-        result_id, simplified = await gis.simplification(tolerance=data.tolerance)
-        return {
-            "status": "success",
-            "operation": "simplify",
-            "tolerance": data.tolerance,
-            "result_id": result_id,
-            "count": len(simplified)
-        }
+        result_id, count = await gis.simplification(tolerance=data.tolerance)
+        return SimplifyResponse(tolerance=data.tolerance, result_id=result_id, count=count)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Simplify operation failed: {str(e)}")
 
 
-@analysis_router.post("/dissolve")
-async def dissolve_operation(data: DissolveRequest):
+@analysis_router.post("/dissolve", response_model=DissolveResponse, openapi_extra=json_body_openapi(DissolveRequest))
+async def dissolve_operation(data: DissolveRequest = Depends(json_body(DissolveRequest)), gis: GISManager = Depends(get_gis)):
     try:
-        result_id, dissolved = await gis.dissolve(by=data.by)
-        return {
-            "status": "success",
-            "operation": "dissolve",
-            "attribute": data.by,
-            "result_id": result_id,
-            "count": len(dissolved)
-        }
+        result_id, count = await gis.dissolve(by=data.by, coverage=data.coverage)
+        return DissolveResponse(attribute=data.by, result_id=result_id, count=count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Dissolve operation failed: {str(e)}")
+
+
+
+@analysis_router.get("/summary_statistics")
+async def summary_statistics_endpoint(feature_id: int | None = Query(default=None), gis: GISManager = Depends(get_gis)):
+    """
+    area, length, bounds and numeric attribute statistics of the dataset or one feature
+    args:
+        feature_id (int, optional): restrict the statistics to one feature
+    returns:
+        dict: status and statistics
+    """
+    try:
+        stats = await gis.summary_statistics(feature_id=feature_id)
+        return {"status": "success", "operation": "summary_statistics", "feature_id": feature_id, **stats}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Summary statistics failed: {str(e)}")
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import uuid
 from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
@@ -9,6 +10,9 @@ load_dotenv()
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(1 << 30)))
 
 
 # DB_USER = "postgres"
@@ -25,16 +29,43 @@ DB_NAME = os.getenv("DB_NAME", "gisdb")
 
 
 # DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "512"))
+# unique per process; change notifications carry it so a process can skip its own writes
+DB_APPLICATION_NAME = f"gis-backend-{uuid.uuid4().hex[:12]}"
+
+
 SYNC_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-sync_engine = create_engine(SYNC_DATABASE_URL, pool_pre_ping=True)
+sync_engine = create_engine(
+    SYNC_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    connect_args={"application_name": DB_APPLICATION_NAME}
+)
 
 # engine = create_engine(DATABASE_URL)
-ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# prepared_statement_cache_size is read by sqlalchemy's asyncpg dialect from the url,
+# statement_cache_size is passed through to asyncpg.connect()
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    f"?prepared_statement_cache_size={DB_STATEMENT_CACHE_SIZE}"
+)
 async_engine = create_async_engine(
     ASYNC_DATABASE_URL,
     echo=False,
     future=True,
-    pool_pre_ping=True
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    connect_args={
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "server_settings": {"application_name": DB_APPLICATION_NAME}
+    }
 )
 
 AsyncSessionLocal = sessionmaker(
@@ -0,0 +1,128 @@
+import numpy as np
+import shapely
+
+HILBERT_MAX = (1 << 16) - 1
+
+
+def hilbert_index(x, y):
+    """
+    position of 16-bit grid cells along the hilbert curve (vectorized port of flatbush's hilbert())
+    args:
+        x, y (np.ndarray): integer cell coordinates in [0, 65535]
+    returns:
+        np.ndarray: uint32 hilbert distances
+    """
+    x = np.asarray(x, dtype=np.uint32)
+    y = np.asarray(y, dtype=np.uint32)
+    mask = np.uint32(0xFFFF)
+
+    a = x ^ y
+    b = mask ^ a
+    c = mask ^ (x | y)
+    d = x & (y ^ mask)
+
+    A = a | (b >> 1)
+    B = (a >> 1) ^ a
+    C = ((c >> 1) ^ (b & (d >> 1))) ^ c
+    D = ((a & (c >> 1)) ^ (d >> 1)) ^ d
+
+    for shift in (2, 4):
+        a, b, c, d = A, B, C, D
+        A = (a & (a >> shift)) ^ (b & (b >> shift))
+        B = (a & (b >> shift)) ^ (b & ((a ^ b) >> shift))
+        C = c ^ ((a & (c >> shift)) ^ (b & (d >> shift)))
+        D = d ^ ((b & (c >> shift)) ^ ((a ^ b) & (d >> shift)))
+
+    a, b, c, d = A, B, C, D
+    C = c ^ ((a & (c >> 8)) ^ (b & (d >> 8)))
+    D = d ^ ((b & (c >> 8)) ^ ((a ^ b) & (d >> 8)))
+
+    a = C ^ (C >> 1)
+    b = D ^ (D >> 1)
+
+    i0 = x ^ y
+    i1 = b | (mask ^ (i0 | a))
+
+    def _interleave(v):
+        v = (v | (v << 8)) & np.uint32(0x00FF00FF)
+        v = (v | (v << 4)) & np.uint32(0x0F0F0F0F)
+        v = (v | (v << 2)) & np.uint32(0x33333333)
+        v = (v | (v << 1)) & np.uint32(0x55555555)
+        return v
+
+    return (_interleave(i1) << 1) | _interleave(i0)
+
+
+class Flatbush:
+    """
+    static packed hilbert R-tree stored as flat (N, 4) bbox arrays, one per level
+
+    cheaper to build and lighter in memory than STRtree on very large layers;
+    query() mirrors STRtree.query(geom, predicate=...)
+    """
+
+    def __init__(self, geoms, node_size: int = 16):
+        """
+        args:
+            geoms (array-like): shapely geometries, indexed by position
+            node_size (int): children per tree node
+        """
+        self.geoms = np.asarray(geoms, dtype=object)
+        self.node_size = node_size
+
+        boxes = shapely.bounds(self.geoms)
+        if len(boxes):
+            min_x, min_y = np.nanmin(boxes[:, 0]), np.nanmin(boxes[:, 1])
+            width = (np.nanmax(boxes[:, 2]) - min_x) or 1.0
+            height = (np.nanmax(boxes[:, 3]) - min_y) or 1.0
+            cx = np.nan_to_num(HILBERT_MAX * ((boxes[:, 0] + boxes[:, 2]) / 2 - min_x) / width)
+            cy = np.nan_to_num(HILBERT_MAX * ((boxes[:, 1] + boxes[:, 3]) / 2 - min_y) / height)
+            order = np.argsort(hilbert_index(cx, cy), kind="stable")
+        else:
+            order = np.arange(0)
+
+        self._ids = order
+        level = boxes[order]
+        self._levels = [level]
+        while len(level) > 1:
+            starts = np.arange(0, len(level), node_size)
+            level = np.column_stack([
+                np.fmin.reduceat(level[:, 0], starts),
+                np.fmin.reduceat(level[:, 1], starts),
+                np.fmax.reduceat(level[:, 2], starts),
+                np.fmax.reduceat(level[:, 3], starts)
+            ])
+            self._levels.append(level)
+
+
+    def __len__(self):
+        return len(self._ids)
+
+
+    def query_bbox(self, min_x, min_y, max_x, max_y):
+        """
+        positions of the geometries whose bbox intersects the given bbox
+        """
+        nodes = np.arange(len(self._levels[-1]))
+        for depth in range(len(self._levels) - 1, -1, -1):
+            boxes = self._levels[depth][nodes]
+            nodes = nodes[
+                (boxes[:, 0] <= max_x) & (boxes[:, 1] <= max_y)
+                & (boxes[:, 2] >= min_x) & (boxes[:, 3] >= min_y)
+            ]
+            if depth == 0:
+                return self._ids[nodes]
+
+            children = (nodes[:, None] * self.node_size + np.arange(self.node_size)).ravel()
+            nodes = children[children < len(self._levels[depth - 1])]
+
+
+    def query(self, geom, predicate: str = None):
+        """
+        positions of the geometries whose bbox intersects geom, refined with
+        a vectorized shapely predicate (e.g. "intersects") when given
+        """
+        idx = self.query_bbox(*shapely.bounds(geom))
+        if predicate is not None and len(idx):
+            idx = idx[getattr(shapely, predicate)(geom, self.geoms[idx])]
+        return idx
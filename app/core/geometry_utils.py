@@ -1,37 +1,78 @@
-from shapely.geometry import shape
-from shapely import wkt, wkb
-from shapely.validation import make_valid
+import json
+import numpy as np
+import shapely
+
+# fmt -> vectorized loader over a list of inputs (wkb is hex encoded)
+_PARSERS = {
+    "geojson": lambda inputs: shapely.from_geojson([json.dumps(g) if isinstance(g, dict) else g for g in inputs]),
+    "wkt": lambda inputs: shapely.from_wkt(list(inputs)),
+    "wkb": lambda inputs: shapely.from_wkb([bytes.fromhex(g) for g in inputs]),
+}
+
+
+def _loader(fmt: str):
+    try:
+        return _PARSERS[fmt]
+    except KeyError:
+        raise ValueError("unsupported geometry format")
+
 
 def parse_geometry(
     geometry_input, fmt: str = "geojson", fix_topology: bool = False):
 
-    if fmt == "geojson":
-        geom = shape(geometry_input)
+    return validate_geometries(_loader(fmt)([geometry_input]), fix_topology)[0]
 
-    elif fmt == "wkt":
-        geom = wkt.loads(geometry_input)
 
-    elif fmt == "wkb":
-        geom = wkb.loads(bytes.fromhex(geometry_input))
+def validate_geometry_type(geom, allowed_types: list):
+    if geom.geom_type not in allowed_types:
+        raise ValueError(
+            f"Invalid geometry type: {geom.geom_type}. "
+            f"Allowed: {allowed_types}"
+        )
 
-    else:
-        raise ValueError("unsupported geometry format")
 
-    if geom.is_empty:
+def parse_geometries_bulk(
+    geometry_inputs, fmt: str = "geojson", fix_topology=False):
+    """
+    parse many geometries with one vectorized shapely call per step
+    args:
+        geometry_inputs (list): geometries in the given format
+        fmt (str): geojson, wkt or wkb (hex)
+        fix_topology (bool or list[bool]): auto-fix invalid geometries, globally or per geometry
+    returns:
+        np.ndarray: shapely geometries
+    """
+    return validate_geometries(_loader(fmt)(geometry_inputs), fix_topology)
+
+
+def validate_geometries(geoms, fix_topology=False):
+    """
+    reject empty geometries and repair invalid ones with one is_valid pass
+    and one make_valid call over the invalid subset
+    args:
+        geoms (np.ndarray): shapely geometries, repaired in place
+        fix_topology (bool or list[bool]): auto-fix invalid geometries, globally or per geometry
+    returns:
+        np.ndarray: the same array
+    """
+    if shapely.is_empty(geoms).any():
         raise ValueError("empty geometry is not allowed")
 
-    if not geom.is_valid:
-        if fix_topology:
-            geom = make_valid(geom)
-        else:
+    invalid = ~shapely.is_valid(geoms)
+    if invalid.any():
+        fixable = np.broadcast_to(np.asarray(fix_topology, dtype=bool), geoms.shape)
+        if (invalid & ~fixable).any():
             raise ValueError("invalid geometry topology")
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
 
-    return geom
+    return geoms
 
 
-def validate_geometry_type(geom, allowed_types: list):
-    if geom.geom_type not in allowed_types:
+def validate_geometry_types(geoms, allowed_types: list):
+    allowed = [int(shapely.GeometryType[t.upper()]) for t in allowed_types]
+    bad = ~np.isin(shapely.get_type_id(geoms), allowed)
+    if bad.any():
         raise ValueError(
-            f"Invalid geometry type: {geom.geom_type}. "
+            f"Invalid geometry type: {geoms[bad][0].geom_type}. "
             f"Allowed: {allowed_types}"
         )
@@ -1,15 +1,200 @@
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
 from shapely.geometry import shape
-from shapely.validation import make_valid
-import json
+from shapely.strtree import STRtree
+import io
+import logging
+import os
+import re
+import orjson
 import asyncio
+import contextvars
+from contextlib import asynccontextmanager, suppress
 from concurrent.futures import ThreadPoolExecutor
-from sqlalchemy.dialects.postgresql import JSONB
-from geoalchemy2 import Geometry
-from sqlalchemy import text, Table, Column, Integer, String, DateTime, MetaData, ARRAY
+from sqlalchemy import text
 from datetime import datetime
-from app.config import sync_engine, async_engine
-from app.core.geometry_utils import parse_geometry, validate_geometry_type
+from app.config import sync_engine, async_engine, DB_APPLICATION_NAME, SNAPSHOT_DIR
+from app.core.flatbush import Flatbush
+from app.core.geometry_utils import (
+    parse_geometry, validate_geometry_type, parse_geometries_bulk, validate_geometry_types
+)
+
+logger = logging.getLogger(__name__)
+
+# above this many features the flat hilbert R-tree is used instead of STRtree
+FLATBUSH_MIN_FEATURES = 100_000
+
+# result tables created by _new_analysis_table
+_ANALYSIS_TABLE = re.compile(r"analysis_[a-z_]+_\d{8}_\d{6}(?:_\d{6})?")
+
+# rows fetched per round trip when streaming a table into memory
+LOAD_PARTITION_ROWS = 10_000
+
+# edits of at least this many rows are written with COPY through a staging table
+COPY_MIN_ROWS = 5_000
+
+# pg_advisory_xact_lock key that serializes tables_exist across workers starting together
+_SCHEMA_LOCK_KEY = 0x6769735F736368  # "gis_sch"
+
+# hot statements, formatted with their table once per manager (see GISManager._stmt)
+_RESERVE_IDS_SQL = "SELECT nextval('{table}_feature_id_seq') FROM generate_series(1, :n)"
+
+_INSERT_FEATURE_SQL = """
+    INSERT INTO {table} (properties, geometry)
+    VALUES (CAST(:props AS JSONB), ST_GeomFromWKB(:geom, 4326))
+    RETURNING feature_id
+"""
+
+_UPDATE_FEATURE_SQL = """
+    UPDATE {table}
+    SET geometry = COALESCE(ST_GeomFromWKB(:geom, 4326), geometry),
+        properties = COALESCE(CAST(:props AS JSONB), properties)
+    WHERE feature_id = :fid
+    RETURNING feature_id
+"""
+
+_DELETE_FEATURE_SQL = "DELETE FROM {table} WHERE feature_id = :fid RETURNING feature_id"
+
+_DELETE_FEATURES_SQL = "DELETE FROM {table} WHERE feature_id = ANY(:ids)"
+
+_INSERT_FEATURES_SQL = """
+    INSERT INTO {table} (feature_id, properties, geometry)
+    VALUES (:feature_id, CAST(:properties AS JSONB), ST_GeomFromWKB(:geometry, 4326))
+"""
+
+_UPSERT_FEATURES_SQL = """
+    INSERT INTO {table} (feature_id, properties, geometry)
+    VALUES (:feature_id, CAST(:properties AS JSONB), ST_GeomFromWKB(:geometry, 4326))
+    ON CONFLICT (feature_id) DO UPDATE
+    SET geometry = EXCLUDED.geometry, properties = EXCLUDED.properties
+"""
+
+_INSERT_STAGED_SQL = """
+    INSERT INTO {table} (feature_id, properties, geometry)
+    SELECT feature_id, CAST(properties AS JSONB), ST_GeomFromWKB(geom, 4326) FROM _features_staging
+"""
+
+_UPSERT_STAGED_SQL = """
+    INSERT INTO {table} (feature_id, properties, geometry)
+    SELECT feature_id, CAST(properties AS JSONB), ST_GeomFromWKB(geom, 4326) FROM _features_staging
+    ON CONFLICT (feature_id) DO UPDATE
+    SET geometry = EXCLUDED.geometry, properties = EXCLUDED.properties
+"""
+
+_INTERSECT_SQL = """
+    SELECT t.feature_id, t.properties, ST_AsBinary(t.geometry) AS _wkb
+    FROM {table} t
+    WHERE ST_Intersects(t.geometry, ST_GeomFromWKB(:mask, 4326))
+    ORDER BY t.feature_id
+"""
+
+_BBOX_SQL = """
+    SELECT t.feature_id, t.properties, ST_AsBinary(t.geometry) AS _wkb
+    FROM {table} t
+    WHERE t.geometry && ST_MakeEnvelope(:xmin, :ymin, :xmax, :ymax, 4326)
+    ORDER BY t.feature_id
+"""
+
+_UNION_SQL = """
+    SELECT ST_AsBinary(ST_Union(geometry))
+    FROM {table}
+    WHERE CAST(:fids AS INTEGER[]) IS NULL OR feature_id = ANY(CAST(:fids AS INTEGER[]))
+"""
+
+_COVERAGE_UNION_SQL = _UNION_SQL.replace("ST_Union(", "ST_CoverageUnion(")
+
+# {columns}: the table's non-geometry columns (see GISManager._select_columns)
+_ANALYSIS_RESULTS_SQL = """
+    SELECT {columns}, ST_AsBinary(t.geometry) AS _wkb FROM {table} t
+    WHERE (CAST(:rid AS INTEGER) IS NULL OR result_id = :rid)
+      AND (CAST(:op AS TEXT) IS NULL OR operation_type = :op)
+    ORDER BY created_at DESC
+"""
+
+_DELETE_RESULT_SQL = "DELETE FROM {table} WHERE result_id = :id"
+
+# statements that name no per-manager table are complete text() objects
+_INSERT_METADATA_SQL = text("""
+    INSERT INTO analysis_metadata (operation_type, parameters, result_table_name)
+    VALUES (:op, :params, :table)
+""")
+
+_TABLE_VERSION_SQL = text("SELECT version FROM table_versions WHERE table_name = :t")
+
+# transaction-local max_parallel_workers_per_gather; the first returns the value it replaced
+_PARALLEL_GATHER_SQL = text("""
+    SELECT current_setting('max_parallel_workers_per_gather'),
+           set_config('max_parallel_workers_per_gather', :value, true)
+""")
+
+_RESTORE_PARALLEL_GATHER_SQL = text("SELECT set_config('max_parallel_workers_per_gather', :value, true)")
+
+_COLUMNS_SQL = text("""
+    SELECT column_name FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = :t AND column_name <> 'geometry'
+    ORDER BY ordinal_position
+""")
+
+_NEAREST_SQL = """
+    WITH candidates AS (
+        SELECT feature_id, properties, geometry
+        FROM {table}
+        ORDER BY geometry <-> ST_GeomFromWKB(:geom, 4326)
+        LIMIT :k
+    )
+    SELECT feature_id, properties, ST_AsBinary(geometry) AS wkb,
+           ST_Distance(
+               ST_Transform(geometry, 32636),
+               ST_Transform(ST_GeomFromWKB(:geom, 4326), 32636)
+           ) AS distance
+    FROM candidates
+    ORDER BY distance
+    LIMIT 1
+"""
+
+
+def _describe(values):
+    """
+    min / max / mean / std along the first axis (None for empty input)
+    """
+    if len(values) == 0:
+        return dict.fromkeys(("min", "max", "mean", "std"))
+    return {
+        "min": np.nanmin(values, axis=0).tolist(),
+        "max": np.nanmax(values, axis=0).tolist(),
+        "mean": np.nanmean(values, axis=0).tolist(),
+        "std": np.nanstd(values, axis=0).tolist()
+    }
+
+
+def _dump_properties(value):
+    """
+    json text for a jsonb column; non-dict values (already text, None) pass through
+    """
+    if isinstance(value, dict):
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return value
+
+
+def _load_properties(values) -> np.ndarray:
+    """
+    decode a jsonb column: dicts pass through, json text is parsed with orjson,
+    anything else (None, bad json) becomes {}
+    """
+    values = np.asarray(values, dtype=object)
+    kinds = np.fromiter(map(type, values), dtype=object, count=len(values))
+    out = values.copy()
+
+    for i in np.flatnonzero(kinds == str):
+        try:
+            out[i] = orjson.loads(values[i])
+        except orjson.JSONDecodeError:
+            out[i] = {}
+    for i in np.flatnonzero((kinds != dict) & (kinds != str)):
+        out[i] = {}
+    return out
 
 
 class GISManager:
@@ -25,135 +210,594 @@ class GISManager:
         self.features_table = "features"
         self.results_table = "analysis_results"
         self.crs = crs
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        # one worker per core: the vectorized shapely calls run here release the GIL inside GEOS
+        self.workers = os.cpu_count() or 4
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        # rows added since the last read of self.gdf, concatenated in one go on access
+        self._pending_rows = []
         self.gdf = None
+        # table self.gdf was loaded from; writes through this manager keep it current,
+        # writes from other processes clear it (see listen_for_changes)
+        self._loaded_table = None
+        self._listen_conn = None
+        self._listen_task = None
+        # ST_CoverageUnion is available (PostGIS >= 3.4, see check_postgis)
+        self.coverage_union = False
+        self._epoch = 0
+        # (epoch, value) caches of the executor helpers
+        self._sindex = None
+        self._proj_geoms = None
+        self._attrs = None
+        self._stats_cache = {}
+        self._stats_epoch = -1
+        # (id(gdf), epoch, body, etag) of the last /feature/show response
+        self._show_cache = None
+        # edits of self.gdf not yet written by save_to_db
+        self._added_ids = set()
+        self._dirty_ids = set()
+        self._deleted_ids = set()
+        # (connection, begin() context) of an open `async with manager:` block, shared by
+        # every operation in it; a context variable, so only the task that opened the block
+        # joins it while concurrent requests on this manager keep their own transactions
+        self._block = contextvars.ContextVar(f"gis_block_{id(self)}", default=None)
+        self._statements = {}
+        # table -> select list of its non-geometry columns (see _select_columns)
+        self._columns = {}
+
+
+    def _stmt(self, template: str, table: str = None, **fields):
+        """
+        text() of a module-level sql template for the features table (or the given table),
+        built once and reused so every call sends byte-identical sql that hits asyncpg's
+        prepared statement cache; fields fill the template's other placeholders
+        """
+        key = (template, table or self.features_table, *sorted(fields.items()))
+        stmt = self._statements.get(key)
+        if stmt is None:
+            stmt = self._statements[key] = text(template.format(table=key[1], **fields))
+        return stmt
+
+
+    async def _select_columns(self, conn, table: str) -> str:
+        """
+        select list of a table's columns other than geometry (which is read once, as WKB),
+        looked up in the catalog once per table
+        """
+        columns = self._columns.get(table)
+        if columns is None:
+            names = (await conn.execute(_COLUMNS_SQL, {"t": table})).scalars().all()
+            if not names:
+                raise ValueError(f"table {table!r} not found")
+            columns = self._columns[table] = ", ".join('t."{}"'.format(name.replace('"', '""')) for name in names)
+        return columns
+
+
+    async def __aenter__(self):
+        """
+        open one connection and transaction that add / update / delete / save and the
+        analysis operations join until the block exits, instead of a BEGIN / COMMIT each
+        """
+        conn_cm = self.async_engine.begin()
+        self._block.set((await conn_cm.__aenter__(), conn_cm))
+        return self
+
+
+    async def __aexit__(self, exc_type, exc, tb):
+        _, conn_cm = self._block.get()
+        self._block.set(None)
+        await conn_cm.__aexit__(exc_type, exc, tb)
+        if exc_type is not None and self._gdf is not None:
+            # the in-memory layer was patched with edits that just got rolled back
+            self.gdf = None
+            self._epoch += 1
+        return False
+
+
+    async def listen_for_changes(self):
+        """
+        hold one connection that LISTENs for writes to the features table from other
+        processes; such a write makes the next load_from_db re-read the table
+        """
+        conn = await self.async_engine.connect()
+        try:
+            driver = (await conn.get_raw_connection()).driver_connection
+            await driver.add_listener(f"{self.features_table}_changed", self._on_features_changed)
+            driver.add_termination_listener(self._on_listen_lost)
+        except Exception:
+            await conn.close()
+            raise
+        self._listen_conn = conn
+
+
+    def _on_features_changed(self, connection, pid, channel, payload):
+        # our own writes already patched the in-memory layer
+        if payload != DB_APPLICATION_NAME:
+            self._loaded_table = None
+
+
+    def _on_listen_lost(self, connection):
+        # notifications stop with the connection (db restart, idle kill): writes may be
+        # missed from here on, so drop the layer and listen again in the background
+        if self._listen_conn is None:  # closed by close()
+            return
+        lost, self._listen_conn = self._listen_conn, None
+        self._loaded_table = None
+        self._listen_task = asyncio.get_running_loop().create_task(self._relisten(lost))
+
+
+    async def _relisten(self, lost, max_delay: float = 30.0):
+        """
+        reconnect the LISTEN connection with exponential backoff
+        """
+        with suppress(Exception):
+            await lost.invalidate()
+        delay = 1.0
+        while True:
+            try:
+                await self.listen_for_changes()
+                break
+            except Exception:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+        # a layer reloaded while nobody was listening may have missed writes
+        self._loaded_table = None
+        self._listen_task = None
+
+
+    async def close(self):
+        """
+        release the pooled connections of both engines and stop the executor (app shutdown)
+        """
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+        if self._listen_conn is not None:
+            conn, self._listen_conn = self._listen_conn, None
+            await conn.close()
+        await self.async_engine.dispose()
+        self.sync_engine.dispose()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+    @asynccontextmanager
+    async def _begin(self):
+        """
+        connection for one operation: a savepoint on the shared connection inside
+        `async with manager:`, otherwise a fresh transaction
+        """
+        block = self._block.get()
+        if block is not None:
+            async with block[0].begin_nested():
+                yield block[0]
+        else:
+            async with self.async_engine.begin() as conn:
+                yield conn
+
+
+    @property
+    def gdf(self):
+        """
+        the in-memory layer, with rows buffered by add_feature appended on first access
+        """
+        if self._pending_rows:
+            added = gpd.GeoDataFrame(self._pending_rows, geometry="geometry", crs=self._gdf.crs)
+            self._pending_rows = []
+            self._gdf = pd.concat([self._gdf, added], ignore_index=True)
+        return self._gdf
+
+
+    @gdf.setter
+    def gdf(self, value):
+        self._pending_rows = []
+        self._gdf = value
 
 
     async def tables_exist(self):
         """
         ensure required tables exist (feature and metadata)
         """
-        metadata = MetaData()
+        # plain IF NOT EXISTS ddl: one round trip per statement and no catalog
+        # reflection per table as metadata.create_all(checkfirst=True) did
+        async with self.async_engine.begin() as conn:
+            # workers starting together would otherwise race on the same catalog rows
+            # (CREATE OR REPLACE FUNCTION, DROP / CREATE TRIGGER); the lock is held to commit
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _SCHEMA_LOCK_KEY})
+            await conn.execute(text(f"""
+                CREATE TABLE IF NOT EXISTS {self.features_table} (
+                    feature_id SERIAL PRIMARY KEY,
+                    properties JSONB,
+                    geometry geometry(GEOMETRY, 4326)
+                )
+            """))
+            await conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS analysis_metadata (
+                    analysis_id SERIAL PRIMARY KEY,
+                    operation_type VARCHAR(50),
+                    parameters JSONB,
+                    result_table_name VARCHAR(255),
+                    created_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+                )
+            """))
+            # feature ids come from the column's sequence; tables written with explicit ids
+            # before it was used get a sequence moved past their highest id
+            seq = f"{self.features_table}_feature_id_seq"
+            await conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {seq} OWNED BY {self.features_table}.feature_id"))
+            await conn.execute(text(
+                f"ALTER TABLE {self.features_table} ALTER COLUMN feature_id SET DEFAULT nextval('{seq}')"
+            ))
+            await conn.execute(text(f"""
+                SELECT setval('{seq}', m)
+                FROM (SELECT MAX(feature_id) AS m FROM {self.features_table}) f
+                WHERE m >= (SELECT CASE WHEN is_called THEN last_value + 1 ELSE last_value END FROM {seq})
+            """))
+            await conn.execute(text(self._geometry_index_sql()))
+            # save_to_db upserts on feature_id, which needs a unique index even on tables
+            # created elsewhere without a primary key
+            await conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{self.features_table}_feature_id "
+                f"ON {self.features_table} (feature_id)"
+            ))
+
+            # every writing statement bumps the table's version (which names its parquet
+            # snapshot) and sends a notification tagged with the writer's application_name
+            await conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS table_versions (
+                    table_name TEXT PRIMARY KEY,
+                    version BIGINT NOT NULL
+                )
+            """))
+            await conn.execute(text("""
+                CREATE OR REPLACE FUNCTION notify_table_changed() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    INSERT INTO table_versions VALUES (TG_TABLE_NAME, 1)
+                    ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1;
+                    PERFORM pg_notify(TG_TABLE_NAME || '_changed', current_setting('application_name'));
+                    RETURN NULL;
+                END
+                $$
+            """))
+            await conn.execute(text(f"DROP TRIGGER IF EXISTS trg_{self.features_table}_notify ON {self.features_table}"))
+            await conn.execute(text(f"""
+                CREATE TRIGGER trg_{self.features_table}_notify
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {self.features_table}
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_table_changed()
+            """))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_analysis_metadata_created_at "
+                "ON analysis_metadata (created_at DESC)"
+            ))
+            await conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_analysis_metadata_operation_type "
+                "ON analysis_metadata (operation_type)"
+            ))
+
+            # analysis_results is not created here; index it when it exists
+            exists = await conn.scalar(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": self.results_table})
+            if exists:
+                await conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{self.results_table}_created_at "
+                    f"ON {self.results_table} (created_at DESC)"
+                ))
+                await conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{self.results_table}_operation_type "
+                    f"ON {self.results_table} (operation_type)"
+                ))
+                await conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS idx_{self.results_table}_geometry "
+                    f"ON {self.results_table} USING GIST (geometry)"
+                ))
+
+
+    async def check_postgis(self):
+        """
+        read the server's PostGIS version once (app startup) to enable the features that need
+        a recent release: ST_CoverageUnion for coverage=True in union / dissolve
+        """
+        async with self.async_engine.connect() as conn:
+            version = await conn.scalar(text("SELECT postgis_lib_version()"))
+        match = re.match(r"(\d+)\.(\d+)", version or "")
+        self.coverage_union = bool(match) and (int(match.group(1)), int(match.group(2))) >= (3, 4)
 
-        Table(
-            self.features_table,
-            metadata,
-            Column('feature_id', Integer, primary_key=True, autoincrement=True),
-            Column('properties', JSONB),
-            Column('geometry', Geometry('GEOMETRY', srid=4326))            
-        )
 
-        Table(
-            "analysis_metadata",
-            metadata,
-            Column("analysis_id", Integer, primary_key=True, autoincrement=True),
-            Column("operation_type", String(50)),
-            Column("parameters", JSONB),
-            Column("result_table_name", String(255)),
-            Column("created_at", DateTime, default=datetime.utcnow)            
-        )
+    def _check_coverage(self, coverage: bool):
+        if coverage and not self.coverage_union:
+            raise ValueError("coverage=true needs PostGIS 3.4 or later (ST_CoverageUnion)")
 
-        async with self.async_engine.begin() as conn:
-            await conn.run_sync(metadata.create_all)
 
+    def _geometry_index_sql(self) -> str:
+        """
+        GIST index on the features geometry; same name geoalchemy2 uses, so it is never duplicated
+        """
+        return (
+            f"CREATE INDEX IF NOT EXISTS idx_{self.features_table}_geometry "
+            f"ON {self.features_table} USING GIST (geometry)"
+        )
 
-    async def load_from_db(self, table_name=None):
+
+    async def load_from_db(self, table_name=None, refresh=False):
         """
-        load features or results from the database into a gdf
+        load features or results from the database into a gdf; the table already in memory
+        is returned as is, since every write through this manager keeps it in step
         args:
             table_name (str, optional): Name of the table to load (default: features).
+            refresh (bool): re-read even if loaded (e.g. after writes from another process)
         Returns:
             GeoDataFrame: Loaded spatial features with geometry and properties.
         """
+        table = self._check_table(table_name)
+        if not refresh and self._gdf is not None and self._loaded_table == table:
+            return self.gdf
+
+        try:
+            snapshot = await self._snapshot_path(table)
+            loop = asyncio.get_running_loop()
+            if snapshot and os.path.exists(snapshot):
+                gdf = await loop.run_in_executor(self.executor, self._read_snapshot, snapshot)
+            else:
+                chunks = [chunk async for chunk in self.iter_features(table)]
+                gdf = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+                if snapshot:
+                    await loop.run_in_executor(self.executor, self._write_snapshot, gdf, snapshot)
+            loaded = table
+
+        except Exception:
+            gdf = gpd.GeoDataFrame(
+                columns=["feature_id", "properties", "geometry"],
+                geometry="geometry",
+                crs=self.crs
+            )
+            loaded = None
+
+        self.gdf = gdf
+        self._loaded_table = loaded
+        self._epoch += 1
+        return self.gdf
+
+
+    async def _snapshot_path(self, table: str):
+        """
+        geoparquet snapshot of the features table at its current version
+        (None for other tables, or before the first versioned write)
+        """
+        if table != self.features_table:
+            return None
+        async with self._begin() as conn:
+            version = await conn.scalar(
+                _TABLE_VERSION_SQL, {"t": table}
+            )
+        return os.path.join(SNAPSHOT_DIR, f"{table}-{version}.parquet") if version is not None else None
+
+
+    def _read_snapshot(self, path: str):
+        gdf = gpd.read_parquet(path).set_crs(self.crs, allow_override=True)
+        gdf["properties"] = _load_properties(gdf["properties"])
+        return gdf
+
+
+    def _write_snapshot(self, gdf, path: str):
+        """
+        write a snapshot (best effort) and drop the older ones of the table; a file is only
+        read while the table version it is named after is current
+        """
+        table, version = os.path.basename(path)[:-len(".parquet")].rsplit("-", 1)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        # geoarrow only encodes a single geometry type; the layer mixes points, lines and
+        # polygons, which are written as WKB
+        type_ids = shapely.get_type_id(np.asarray(gdf.geometry.values))
+        encoding = "geoarrow" if len(np.unique(type_ids[type_ids >= 0])) <= 1 else "WKB"
+        try:
+            gdf.assign(properties=[_dump_properties(p) for p in gdf["properties"]]).to_parquet(
+                tmp, geometry_encoding=encoding, compression="zstd"
+            )
+            os.replace(tmp, path)
+            # workers share the directory: a slow writer of an old version must not
+            # remove the newer snapshots others have written meanwhile
+            for name in os.listdir(SNAPSHOT_DIR):
+                match = re.fullmatch(rf"{re.escape(table)}-(\d+)\.parquet", name)
+                if match and int(match.group(1)) < int(version):
+                    with suppress(FileNotFoundError):
+                        os.remove(os.path.join(SNAPSHOT_DIR, name))
+        except Exception:
+            logger.warning("could not write snapshot %s", path, exc_info=True)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+    async def iter_features(self, table_name=None, batch_rows: int = LOAD_PARTITION_ROWS):
+        """
+        stream a table as GeoDataFrame chunks through a server-side cursor, so callers
+        can work on the first rows before the rest has arrived
+        args:
+            table_name (str, optional): table to read (default: features)
+            batch_rows (int): rows per chunk
+        yields:
+            GeoDataFrame: decoded, validated chunk (at least one, possibly empty)
+        """
+        table = self._check_table(table_name)
+
+        async with self._begin() as conn:
+            select = await self._select_columns(conn, table)
+            result = await conn.stream(
+                text(f"SELECT {select}, ST_AsBinary(t.geometry) AS _wkb FROM {table} t"),
+                execution_options={"yield_per": batch_rows}
+            )
+            columns = list(result.keys())
+            empty = True
+            async for part in result.partitions(batch_rows):
+                empty = False
+                yield self._decode_rows(part, columns)
+            if empty:
+                yield self._decode_rows([], columns)
+
+
+    def _check_table(self, table_name=None) -> str:
+        """
+        table names are spliced into sql, so only the features table and
+        analysis result tables are accepted
+        """
         table = table_name or self.features_table
+        if table != self.features_table and not _ANALYSIS_TABLE.fullmatch(table):
+            raise ValueError(f"unknown table: {table!r}")
+        return table
 
-        def _load():
-            try:
-                gdf = gpd.read_postgis(
-                    f"SELECT * FROM {table}",
-                    self.sync_engine,
-                    geom_col="geometry"
-                )
 
-                if gdf.crs is None:
-                    gdf.set_crs(epsg=4326, inplace=True)
+    def _decode_rows(self, rows, columns):
+        """
+        GeoDataFrame of streamed rows: the _wkb column becomes the geometry, properties are parsed
+        """
+        frame = pd.DataFrame.from_records(rows, columns=columns)
+        geoms = shapely.from_wkb(np.asarray(frame.pop("_wkb").to_numpy(), dtype=object))
+        gdf = gpd.GeoDataFrame(frame, geometry=geoms, crs=self.crs)
 
-                def fix_properties(properties):
-                    if isinstance(properties, dict):
-                        return properties
-                    if isinstance(properties, str):
-                        try:
-                            return json.loads(properties)
-                        except Exception:
-                            return {}
-                    return {}
+        if "properties" in gdf.columns:
+            gdf["properties"] = _load_properties(gdf["properties"])
 
-                if "properties" in gdf.columns:
-                    gdf["properties"] = gdf["properties"].apply(fix_properties)
+        return self._ensure_valid(gdf)
 
-                return gdf
 
-            except Exception:
-                return gpd.GeoDataFrame(
-                    columns=["feature_id", "properties", "geometry"],
-                    crs=self.crs
-                )
+    @staticmethod
+    def _ensure_valid(gdf):
+        """
+        repair invalid stored geometries with one vectorized is_valid / make_valid pass
+        """
+        geoms = np.array(gdf.geometry.values, dtype=object)
+        invalid = ~shapely.is_valid(geoms) & ~shapely.is_missing(geoms)
+        if invalid.any():
+            geoms[invalid] = shapely.make_valid(geoms[invalid])
+            gdf["geometry"] = gpd.GeoSeries(geoms, index=gdf.index, crs=gdf.crs)
+        return gdf
 
-        loop = asyncio.get_running_loop()
-        self.gdf = await loop.run_in_executor(self.executor, _load)
-        return self.gdf
 
+    async def save_to_db(self):
+        """
+        flush the tracked edits of self.gdf: insert the added rows, upsert the dirty ones and
+        delete the removed ones, instead of rewriting the whole table
+        """
+        added, dirty, deleted = self._added_ids, self._dirty_ids, self._deleted_ids
+        self._added_ids, self._dirty_ids, self._deleted_ids = set(), set(), set()
+
+        rows = self.gdf[self.gdf["feature_id"].isin(added | dirty)] if added or dirty else self.gdf.iloc[:0]
+        is_new = rows["feature_id"].isin(added).to_numpy()
+
+        try:
+            async with self._begin() as conn:
+                if deleted:
+                    await conn.execute(self._stmt(_DELETE_FEATURES_SQL), {"ids": sorted(deleted)})
+
+                # added rows carry sequence ids and get a plain INSERT, so a collision fails
+                # instead of replacing someone else's feature
+                await self._write_rows(conn, rows[is_new], _INSERT_STAGED_SQL, _INSERT_FEATURES_SQL)
+                await self._write_rows(conn, rows[~is_new], _UPSERT_STAGED_SQL, _UPSERT_FEATURES_SQL)
+        except Exception:
+            # the in-memory layer already holds edits that never reached the table
+            self.gdf = None
+            self._loaded_table = None
+            self._epoch += 1
+            raise
+
+
+    async def _write_rows(self, conn, rows, staged_sql: str, values_sql: str):
+        """
+        write rows of self.gdf with values_sql, or through a COPY into a staging table
+        and staged_sql when there are at least COPY_MIN_ROWS of them
+        """
+        fids = [int(fid) for fid in rows["feature_id"]]
+        props = [_dump_properties(v) for v in rows["properties"]]
+        wkb = shapely.to_wkb(np.asarray(rows.geometry.values))
+
+        if len(fids) >= COPY_MIN_ROWS:
+            # one COPY into a staging table and one set-based statement instead of N;
+            # the CREATE goes through sqlalchemy so its transaction is already open when the
+            # raw driver is used (otherwise the table is dropped by its own autocommit)
+            await conn.execute(text("""
+                CREATE TEMP TABLE _features_staging (
+                    feature_id INTEGER, geom BYTEA, properties TEXT
+                ) ON COMMIT DROP
+            """))
+            driver = (await conn.get_raw_connection()).driver_connection
+            await driver.copy_records_to_table(
+                "_features_staging",
+                records=zip(fids, wkb, props),
+                columns=["feature_id", "geom", "properties"]
+            )
+            await conn.execute(self._stmt(staged_sql))
+            # dropped right away so the next call in this transaction can stage again
+            await conn.execute(text("DROP TABLE _features_staging"))
+
+        elif fids:
+            await conn.execute(self._stmt(values_sql), [
+                {"feature_id": fid, "properties": prop, "geometry": geom}
+                for fid, prop, geom in zip(fids, props, wkb)
+            ])
 
-    async def save_to_db(self, update_only=False):
+
+    async def copy_features(self, gdf):
         """
-        save GeoDataFrame to the database 
+        bulk-append rows to the features table with COPY ... FROM STDIN (csv, EWKB hex geometry)
         args:
-            update_only (bool): If True only updates existing records; otherwise replaces the table
+            gdf (GeoDataFrame): feature_id, properties (json text) and geometry columns in EPSG:4326
         """
-        if not update_only:
+        async with self.async_engine.connect() as conn:
+            first_load = not await conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {self.features_table})"))
+
+        def _copy():
+            geoms = shapely.set_srid(np.asarray(gdf.geometry.values), 4326)
+            buf = io.StringIO()
+            pd.DataFrame({
+                "feature_id": gdf["feature_id"].to_numpy(),
+                "properties": gdf["properties"].to_numpy(dtype=object),
+                "geometry": shapely.to_wkb(geoms, hex=True, include_srid=True)
+            }).to_csv(buf, index=False, header=False)
+            buf.seek(0)
+
+            sql = f"COPY {self.features_table} (feature_id, properties, geometry) FROM STDIN WITH (FORMAT csv)"
+            conn = self.sync_engine.raw_connection()
+            try:
+                with conn.cursor() as cur:
+                    # building the GIST index once over a loaded table beats updating it per row;
+                    # drop and rebuild happen in the COPY's transaction, so a failed load keeps it
+                    if first_load:
+                        cur.execute(f"DROP INDEX IF EXISTS idx_{self.features_table}_geometry")
+                    if hasattr(cur, "copy_expert"):  # psycopg2
+                        cur.copy_expert(sql, buf)
+                    else:  # psycopg 3
+                        with cur.copy(sql) as copy:
+                            copy.write(buf.getvalue())
+                    if first_load:
+                        cur.execute(self._geometry_index_sql())
+                conn.commit()
+            finally:
+                conn.close()
 
-            def _save():
-                temp_gdf = self.gdf.copy()
-                temp_gdf["properties"] = temp_gdf["properties"].apply(
-                    lambda v: json.dumps(v, ensure_ascii=False)
-                    if isinstance(v, dict) else v
-                )
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, _copy)
 
-                temp_gdf.to_postgis(
-                    name=self.features_table,
-                    con=self.sync_engine,
-                    if_exists="replace",
-                    index=False,
-                    dtype={
-                        "geometry": Geometry("GEOMETRY", srid=4326),
-                        "properties": JSONB()
-                    }
-                )
+        # a large COPY leaves the planner with stale row estimates; refresh them so
+        # spatial predicates keep choosing the GIST index, and lay the first bulk load
+        # out in index order so bbox scans touch neighbouring pages
+        async with self.async_engine.begin() as conn:
+            if first_load:
+                await conn.execute(text(
+                    f"CLUSTER {self.features_table} USING idx_{self.features_table}_geometry"
+                ))
+            await conn.execute(text(f"ANALYZE {self.features_table}"))
 
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(self.executor, _save)
+        if self.gdf is not None:
+            added = gdf[["feature_id", "properties", "geometry"]].copy()
+            added["properties"] = _load_properties(added["properties"])
+            self.gdf = pd.concat([self.gdf, added], ignore_index=True)
+            self._epoch += 1
 
-        else:
-            sql = text("""
-                UPDATE features
-                SET geometry = ST_GeomFromText(:geometry, 4326),
-                    properties = :properties
-                WHERE feature_id = :feature_id
-            """)
-
-            data = [
-                {
-                    "geometry": r.geometry.wkt,
-                    "properties": json.dumps(r.properties, ensure_ascii=False)
-                    if isinstance(r.properties, dict)
-                    else r.properties,
-                    "feature_id": int(r.feature_id)
-                }
-                for r in self.gdf.itertuples(index=False)
-            ]
 
-            async with self.async_engine.begin() as conn:
-                await conn.execute(sql, data)
+    async def reserve_feature_ids(self, n: int) -> list:
+        """
+        draw n feature ids from the table's sequence; unlike MAX(feature_id) + 1 they are
+        never handed out twice, whatever worker or transaction asks concurrently
+        """
+        async with self._begin() as conn:
+            result = await conn.execute(self._stmt(_RESERVE_IDS_SQL), {"n": n})
+            return [int(fid) for fid in result.scalars()]
 
 
     async def add_feature(self, geom_dict, properties: dict, fix_topology=False):
@@ -169,17 +813,20 @@ class GISManager:
         geom = parse_geometry(geom_dict, fmt="geojson", fix_topology=fix_topology)
         validate_geometry_type(geom, allowed_types=["Point", "LineString", "Polygon"])
 
-        await self.load_from_db()
-        feature_id = int(self.gdf["feature_id"].max() + 1) if not self.gdf.empty else 1
-
-        self.gdf.loc[len(self.gdf)] = {
-            "feature_id": feature_id,
-            "properties": properties,
-            "geometry": geom
-        }
+        async with self._begin() as conn:
+            feature_id = await conn.scalar(
+                self._stmt(_INSERT_FEATURE_SQL),
+                {"props": _dump_properties(properties), "geom": shapely.to_wkb(geom)}
+            )
 
-        self.gdf.set_geometry("geometry", inplace=True)
-        await self.save_to_db()
+        # keep an already loaded layer in step instead of reloading it
+        if self._gdf is not None:
+            self._pending_rows.append({
+                "feature_id": feature_id,
+                "properties": properties,
+                "geometry": geom
+            })
+            self._epoch += 1
         return feature_id
 
 
@@ -187,21 +834,32 @@ class GISManager:
         """
         update features [geometry / properties] and save to db
         """
-        await self.load_from_db()
-        if self.gdf.empty or feature_id not in self.gdf["feature_id"].values:
-            raise ValueError("Feature not found")
-
-        idx = self.gdf[self.gdf["feature_id"] == feature_id].index[0]
-
+        geom = None
         if new_geom:
             geom = parse_geometry(new_geom, fmt="geojson", fix_topology=fix_topology)
             validate_geometry_type(geom, allowed_types=["Point", "LineString", "Polygon"])
-            self.gdf.at[idx, "geometry"] = geom
 
-        if new_properties:
-            self.gdf.at[idx, "properties"] = new_properties
+        async with self._begin() as conn:
+            updated = await conn.scalar(
+                self._stmt(_UPDATE_FEATURE_SQL),
+                {
+                    "geom": shapely.to_wkb(geom) if geom is not None else None,
+                    "props": _dump_properties(new_properties) if new_properties else None,
+                    "fid": feature_id
+                }
+            )
+        if updated is None:
+            raise ValueError("Feature not found")
 
-        await self.save_to_db(update_only=True)
+        if self.gdf is not None:
+            rows = np.flatnonzero(self.gdf["feature_id"].to_numpy() == feature_id)
+            if len(rows):
+                idx = self.gdf.index[rows[0]]
+                if geom is not None:
+                    self.gdf.at[idx, "geometry"] = geom
+                if new_properties:
+                    self.gdf.at[idx, "properties"] = new_properties
+                self._epoch += 1
         return feature_id
 
 
@@ -209,112 +867,265 @@ class GISManager:
         """
         delete feature and save to db
         """
-        await self.load_from_db()
-        before = len(self.gdf)
-        self.gdf = self.gdf[self.gdf["feature_id"] != feature_id].reset_index(drop=True)
-        deleted = len(self.gdf) < before
-        if deleted:
-            await self.save_to_db()  
+        async with self._begin() as conn:
+            result = await conn.execute(
+                self._stmt(_DELETE_FEATURE_SQL),
+                {"fid": feature_id}
+            )
+            deleted = result.first() is not None
+
+        if deleted and self.gdf is not None:
+            self.gdf = self.gdf[self.gdf["feature_id"] != feature_id].reset_index(drop=True)
+            self._epoch += 1
         return deleted
 
 
-    # === analysis operations ===
+    # the helpers below run in the executor on a frame captured with its epoch on the
+    # event loop; a reload there can replace self.gdf at any await, so they never read
+    # self.gdf and cache (epoch, value) pairs that are swapped in with one assignment
 
-    async def _create_analysis_table(self, gdf: gpd.GeoDataFrame, operation: str, params: dict):
+    def _spatial_index(self, gdf, epoch: int):
         """
-        Create a new table for each analysis operation
+        return the spatial index of gdf (the layer at `epoch`), rebuilt only when the epoch
+        changes (STRtree, or Flatbush for layers above FLATBUSH_MIN_FEATURES)
         """
-        table_name = f"analysis_{operation}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        cached = self._sindex
+        if cached is None or cached[0] != epoch:
+            geoms = np.asarray(gdf.geometry.values)
+            cached = self._sindex = (epoch, Flatbush(geoms) if len(geoms) > FLATBUSH_MIN_FEATURES else STRtree(geoms))
+        return cached[1]
 
-        async with self.async_engine.begin() as conn:
-            await conn.execute(text(f"""
-                CREATE TABLE IF NOT EXISTS {table_name} (
-                    id SERIAL PRIMARY KEY,
-                    feature_id INTEGER,
-                    geometry geometry(GEOMETRY, 4326),
-                    properties JSONB
-                );
-            """))
 
-            gdf_copy = gdf.copy()
-            gdf_copy["properties"] = gdf_copy["properties"].apply(
-                lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, dict) else v
-            )
+    def _projected_geometries(self, gdf, epoch: int):
+        """
+        return the geometries of gdf (the layer at `epoch`) in EPSG:32636 (metric areas
+        and lengths), reprojected only when the epoch changes
+        """
+        cached = self._proj_geoms
+        if cached is None or cached[0] != epoch:
+            cached = self._proj_geoms = (epoch, np.asarray(gdf.to_crs(epsg=32636).geometry.values))
+        return cached[1]
 
-            for _, row in gdf_copy.iterrows():
-                await conn.execute(
-                    text(f"""
-                        INSERT INTO {table_name} (feature_id, geometry, properties)
-                        VALUES (:fid, ST_GeomFromText(:geom, 4326), :props)
-                    """),
-                    {"fid": int(row["feature_id"]), "geom": row.geometry.wkt, "props": row["properties"]}
-                )
 
-            await conn.execute(text("""
-                INSERT INTO analysis_metadata (operation_type, parameters, result_table_name)
-                VALUES (:op, :params, :table)
-            """), {"op": operation, "params": json.dumps(params), "table": table_name})
-
-        return table_name
+    def _attribute_frame(self, gdf, epoch: int):
+        """
+        properties of gdf (the layer at `epoch`) flattened into columns (pd.json_normalize,
+        nested keys as "a.b"), row-aligned with gdf and rebuilt only when the epoch changes
+        """
+        cached = self._attrs
+        if cached is None or cached[0] != epoch:
+            props = [p if isinstance(p, dict) else {} for p in gdf["properties"].to_numpy()]
+            cached = self._attrs = (epoch, pd.json_normalize(props))
+        return cached[1]
 
 
-    async def buffer(self, distance: float, feature_id: int = None):
+    async def batch_apply(self, adds: list = None, updates: list = None, deletes: list = None):
         """
-        create buffer for a feature or all features
+        apply many edits with a single load and a single save
+        args:
+            adds (list[dict]): geometry, properties, fix_topology
+            updates (list[dict]): feature_id, geometry, properties, fix_topology
+            deletes (list[int]): feature ids to delete
+        returns:
+            dict: ids of the added features, number of updated and deleted features
         """
-        await self.load_from_db()
-        target = self.gdf[self.gdf["feature_id"] == feature_id] if feature_id else self.gdf
+        adds, updates, deletes = adds or [], updates or [], deletes or []
+        allowed_types = ["Point", "LineString", "Polygon"]
 
-        if target.empty:
-            raise ValueError(f"Feature ID {feature_id} not found")
+        await self.load_from_db()
+        gdf = self.gdf
+
+        before = len(gdf)
+        if deletes:
+            gdf = gdf[~gdf["feature_id"].isin(deletes)]
+        deleted = before - len(gdf)
+
+        if updates:
+            positions = pd.Index(gdf["feature_id"]).get_indexer([u["feature_id"] for u in updates])
+            if (positions < 0).any():
+                raise ValueError("Feature not found")
+
+            geometry = np.asarray(gdf.geometry.values, dtype=object)
+            properties = gdf["properties"].to_numpy(dtype=object, copy=True)
+
+            geom_updates = [(pos, u) for pos, u in zip(positions, updates) if u.get("geometry")]
+            if geom_updates:
+                geoms = parse_geometries_bulk(
+                    [u["geometry"] for _, u in geom_updates],
+                    fix_topology=[u.get("fix_topology", False) for _, u in geom_updates]
+                )
+                validate_geometry_types(geoms, allowed_types)
+                geometry[[pos for pos, _ in geom_updates]] = geoms
+
+            for pos, u in zip(positions, updates):
+                if u.get("properties"):
+                    properties[pos] = u["properties"]
+
+            gdf = gdf.copy()
+            gdf["properties"] = properties
+            gdf["geometry"] = gpd.GeoSeries(geometry, index=gdf.index, crs=gdf.crs)
+
+        new_ids = []
+        if adds:
+            geoms = parse_geometries_bulk(
+                [a["geometry"] for a in adds],
+                fix_topology=[a.get("fix_topology", False) for a in adds]
+            )
+            validate_geometry_types(geoms, allowed_types)
+            # never derived from the in-memory layer, which may be stale or empty
+            new_ids = await self.reserve_feature_ids(len(adds))
+            new_gdf = gpd.GeoDataFrame(
+                {
+                    "feature_id": new_ids,
+                    "properties": [a.get("properties") or {} for a in adds],
+                    "geometry": geoms
+                },
+                geometry="geometry",
+                crs=self.crs
+            )
+            gdf = pd.concat([gdf, new_gdf], ignore_index=True)
+
+        self.gdf = gdf.reset_index(drop=True)
+        self._epoch += 1
+        self._deleted_ids.update(deletes)
+        self._added_ids.update(new_ids)
+        self._dirty_ids.update([u["feature_id"] for u in updates])
+        self._dirty_ids.difference_update(deletes)
+        await self.save_to_db()
+        return {"added": new_ids, "updated": len(updates), "deleted": deleted}
 
-        def _buffer():
-            result_gdf = target.copy()
-            result_gdf["geometry"] = result_gdf.geometry.buffer(distance / 100000.0)
-            return result_gdf
 
-        loop = asyncio.get_running_loop()
-        result_gdf = await loop.run_in_executor(self.executor, _buffer)
+    # === analysis operations ===
 
-        table_name = await self._create_analysis_table(result_gdf, "buffer", {"distance": distance})
-        return table_name, result_gdf
+    async def _new_analysis_table(self, conn, operation: str, params: dict) -> str:
+        """
+        create the result table of an analysis operation and record it in analysis_metadata
+        """
+        # microseconds, so two results of the same operation within a second get separate tables
+        table_name = f"analysis_{operation}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+        await conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id SERIAL PRIMARY KEY,
+                feature_id INTEGER,
+                geometry geometry(GEOMETRY, 4326),
+                properties JSONB
+            );
+        """))
+        await conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_geometry ON {table_name} USING GIST (geometry)"))
+        await conn.execute(_INSERT_METADATA_SQL, {"op": operation, "params": orjson.dumps(params).decode(), "table": table_name})
+        return table_name
 
 
-    async def clip(self, geom_dict: dict, feature_ids: list = None, description: str = None):
+    async def _analysis_from_query(
+        self, operation: str, params: dict, select_sql: str, binds: dict, returning=False, empty_error: str = None
+    ):
         """
-        Clip features by given geometry
+        run an analysis inside PostGIS: select_sql yields (feature_id, geometry, properties) rows
+        that are inserted straight into a new result table
+        args:
+            returning (bool): also return the inserted rows as a GeoDataFrame
+            empty_error (str, optional): raise ValueError with this message (and roll back) when no row is produced
+        returns:
+            tuple: (table_name, row count) or (table_name, GeoDataFrame)
         """
-        await self.load_from_db()
-        if self.gdf.empty: 
-            return None
+        async with self._begin() as conn:
+            table_name = await self._new_analysis_table(conn, operation, params)
+            insert = f"INSERT INTO {table_name} (feature_id, geometry, properties) {select_sql}"
+            if returning:
+                insert += " RETURNING feature_id, properties, ST_AsBinary(geometry) AS wkb"
+            result = await conn.execute(text(insert), binds)
+            if empty_error and result.rowcount == 0:
+                raise ValueError(empty_error)
+
+            if not returning:
+                return table_name, result.rowcount
+
+            rows = result.all()
+            gdf = gpd.GeoDataFrame(
+                {
+                    "feature_id": [r.feature_id for r in rows],
+                    "properties": _load_properties([r.properties for r in rows]),
+                    "geometry": shapely.from_wkb([r.wkb for r in rows])
+                },
+                geometry="geometry",
+                crs=self.crs
+            )
+            return table_name, gdf
 
-        clip_geom = shape(geom_dict)
-        clip_geom = make_valid(clip_geom) if not clip_geom.is_valid else clip_geom
 
-        def _clip():
-            work_gdf = self.gdf[self.gdf["feature_id"].isin(feature_ids)].copy() if feature_ids else self.gdf.copy()
-            clipped = gpd.clip(work_gdf, clip_geom)
-            return clipped
+    async def buffer(self, distance: float, feature_id: int = None):
+        """
+        create buffer for a feature or all features inside PostGIS
+        args:
+            distance (float): buffer distance in meters (geography buffer)
+            feature_id (int, optional): buffer only this feature
+        returns:
+            tuple: (result table name, number of buffered features)
+        """
+        return await self._analysis_from_query(
+            "buffer",
+            {"distance": distance},
+            f"""
+            SELECT feature_id, ST_Buffer(geometry::geography, :distance)::geometry, properties
+            FROM {self.features_table}
+            WHERE CAST(:fid AS INTEGER) IS NULL OR feature_id = CAST(:fid AS INTEGER)
+            """,
+            {"distance": distance, "fid": feature_id or None},
+            empty_error=f"Feature ID {feature_id} not found" if feature_id else "No features to buffer"
+        )
 
-        loop = asyncio.get_running_loop()
-        clipped_gdf = await loop.run_in_executor(self.executor, _clip)
 
-        table_name = await self._create_analysis_table(clipped_gdf, "clip", {"clip_geometry": geom_dict})
-        return table_name, clipped_gdf
+    async def clip(self, geom_dict: dict, feature_ids: list = None, description: str = None):
+        """
+        Clip features by given geometry inside PostGIS (GIST-filtered ST_Intersection);
+        only the clipped rows come back
+        """
+        clip_geom = shape(geom_dict)
+        clip_geom = clip_geom if shapely.is_valid(clip_geom) else shapely.make_valid(clip_geom)
+
+        return await self._analysis_from_query(
+            "clip",
+            {"clip_geometry": geom_dict},
+            f"""
+            SELECT feature_id, clipped, properties
+            FROM (
+                SELECT feature_id, properties,
+                       ST_Intersection(geometry, ST_GeomFromWKB(:mask, 4326)) AS clipped
+                FROM {self.features_table}
+                WHERE ST_Intersects(geometry, ST_GeomFromWKB(:mask, 4326))
+                  AND (CAST(:fids AS INTEGER[]) IS NULL OR feature_id = ANY(CAST(:fids AS INTEGER[])))
+            ) c
+            WHERE NOT ST_IsEmpty(clipped)
+            ORDER BY feature_id
+            """,
+            {"mask": shapely.to_wkb(clip_geom), "fids": feature_ids or None},
+            returning=True
+        )
 
 
     async def intersect(self, geom_dict: dict):
         """
-        Perform intersection between stored features and a given geometry
+        Perform intersection between stored features and a given geometry; served from the
+        in-memory spatial index when the layer is loaded, otherwise only the matching rows
+        are fetched with an index-assisted ST_Intersects query
         """
-        gdf = await self.load_from_db()
+        mask = shape(geom_dict)
+        mask = mask if shapely.is_valid(mask) else shapely.make_valid(mask)
+
+        if self._gdf is None or self._loaded_table != self.features_table:
+            async with self._begin() as conn:
+                result = await conn.execute(self._stmt(_INTERSECT_SQL), {"mask": shapely.to_wkb(mask)})
+                return self._decode_rows(result.all(), list(result.keys()))
+
+        gdf, epoch = self.gdf, self._epoch
+        # same answer as the sql path: an empty layer intersects nothing
         if gdf.empty:
-            raise ValueError("No features available for intersection")
+            return gdf.iloc[:0]
 
         def _intersect():
-            mask = shape(geom_dict)
-            mask = make_valid(mask) if not mask.is_valid else mask
-            intersected = gdf[gdf.intersects(mask)]
+            idx = self._spatial_index(gdf, epoch).query(mask, predicate="intersects")
+            intersected = gdf.iloc[np.sort(idx)]
             return intersected
 
         loop = asyncio.get_running_loop()
@@ -324,104 +1135,172 @@ class GISManager:
 
     async def simplification(self, tolerance: float, feature_ids: list = None):
         """
-        Simplify geometries and save result
+        Simplify geometries inside PostGIS (ST_SimplifyPreserveTopology, the same GEOS
+        simplifier shapely uses with preserve_topology=True) and save result
+        returns:
+            tuple: (result table name, number of simplified features)
         """
-        await self.load_from_db()
-
-        def _simplify():
-            if feature_ids:
-                work_gdf = self.gdf[self.gdf["feature_id"].isin(feature_ids)].copy()
-            else:
-                work_gdf = self.gdf.copy()
-            work_gdf["geometry"] = work_gdf.geometry.simplify(tolerance=tolerance, preserve_topology=True)
-            return work_gdf
+        return await self._analysis_from_query(
+            "simplify",
+            {"tolerance": tolerance},
+            f"""
+            SELECT feature_id, ST_SimplifyPreserveTopology(geometry, :tolerance), properties
+            FROM {self.features_table}
+            WHERE CAST(:fids AS INTEGER[]) IS NULL OR feature_id = ANY(CAST(:fids AS INTEGER[]))
+            """,
+            {"tolerance": tolerance, "fids": feature_ids or None}
+        )
 
-        loop = asyncio.get_running_loop()
-        simplified = await loop.run_in_executor(self.executor, _simplify)
 
-        table_name = await self._create_analysis_table(simplified, "simplify", {"tolerance": tolerance})
-        return table_name, simplified
+    async def dissolve(self, by: str, feature_ids: list = None, coverage: bool = False):
+        """
+        Dissolve features by a top-level property inside PostGIS (ST_Union ... GROUP BY);
+        features without the property are left out
+        args:
+            coverage (bool): the polygons form a coverage, so each group is merged with
+                ST_CoverageUnion instead of a full overlay
+        returns:
+            tuple: (result table name, number of dissolved features)
+        """
+        self._check_coverage(coverage)
+        return await self._analysis_from_query(
+            "dissolve",
+            {"by": by, "coverage": coverage},
+            f"""
+            SELECT MIN(feature_id), {"ST_CoverageUnion" if coverage else "ST_Union"}(geometry), jsonb_build_object(CAST(:by AS TEXT), key)
+            FROM (
+                SELECT feature_id, geometry, properties -> CAST(:by AS TEXT) AS key
+                FROM {self.features_table}
+                WHERE CAST(:fids AS INTEGER[]) IS NULL OR feature_id = ANY(CAST(:fids AS INTEGER[]))
+            ) f
+            WHERE key IS NOT NULL AND key <> 'null'::jsonb
+            GROUP BY key
+            ORDER BY MIN(feature_id)
+            """,
+            {"by": by, "fids": feature_ids or None}
+        )
 
 
-    async def dissolve(self, by: str, feature_ids: list = None):
+    async def summary_statistics(self, feature_id: int = None):
         """
-        Dissolve features by an attribute
+        geometry and numeric attribute statistics, cached until the epoch changes
+        args:
+            feature_id (int, optional): restrict the statistics to one feature
+        returns:
+            dict: count, total_bounds, area_m2, length_m and numeric attributes (min / max / mean / std)
         """
         await self.load_from_db()
+        gdf, epoch = self.gdf, self._epoch
 
-        if by not in self.gdf.columns:
-            self.gdf[by] = self.gdf["properties"].apply(
-                lambda p: p.get("properties", {}).get(by) if isinstance(p, dict) else None
-            )
+        if self._stats_epoch != epoch:
+            self._stats_cache = {}
+            self._stats_epoch = epoch
+        if feature_id in self._stats_cache:
+            return self._stats_cache[feature_id]
 
-        def _dissolve():
-            if feature_ids:
-                work_gdf = self.gdf[self.gdf["feature_id"].isin(feature_ids)].copy()
+        def _stats():
+            if feature_id is None:
+                mask = np.ones(len(gdf), dtype=bool)
             else:
-                work_gdf = self.gdf.copy()
-            dissolved = work_gdf.dissolve(by=by, as_index=False)
-            return dissolved
+                mask = (gdf["feature_id"] == feature_id).to_numpy()
+                if not mask.any():
+                    raise ValueError(f"Feature ID {feature_id} not found")
 
-        loop = asyncio.get_running_loop()
-        dissolved = await loop.run_in_executor(self.executor, _dissolve)
+            geoms_proj = self._projected_geometries(gdf, epoch)[mask]
+            numeric = self._attribute_frame(gdf, epoch)[mask].select_dtypes(include="number").dropna(axis=1, how="all")
+            attrs = _describe(numeric.to_numpy(dtype=float))
 
-        table_name = await self._create_analysis_table(dissolved, "dissolve", {"by": by})
-        return table_name, dissolved
+            return {
+                "count": int(mask.sum()),
+                "total_bounds": shapely.total_bounds(np.asarray(gdf.geometry.values)[mask]).tolist(),
+                "area_m2": _describe(shapely.area(geoms_proj)),
+                "length_m": _describe(shapely.length(geoms_proj)),
+                "attributes": {
+                    col: {stat: attrs[stat][i] for stat in attrs} if len(numeric) else attrs
+                    for i, col in enumerate(numeric.columns)
+                }
+            }
+
+        loop = asyncio.get_running_loop()
+        stats = await loop.run_in_executor(self.executor, _stats)
+        # the layer may have been reloaded meanwhile; only cache stats of the current one
+        if self._stats_epoch == epoch:
+            self._stats_cache[feature_id] = stats
+        return stats
 
 
-    async def union(self, feature_ids: list = None):
+    async def union(self, feature_ids: list = None, coverage: bool = False):
         """
-        Union multiple features
+        Union multiple features with the ST_Union aggregate inside PostGIS
+        args:
+            feature_ids (list, optional): union only these features
+            coverage (bool): the polygons form a coverage, so the much cheaper
+                ST_CoverageUnion (drop shared edges) replaces the full overlay
+        returns:
+            shapely geometry, or None when no feature matched
         """
-        await self.load_from_db()
-
-        def _union():
-            features = self.gdf[self.gdf['feature_id'].isin(feature_ids)] if feature_ids else self.gdf
-            if len(features) == 0: 
-                return None
-            return features.geometry.unary_union
-
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(self.executor, _union)
+        self._check_coverage(coverage)
+        async with self._begin() as conn:
+            # let the aggregate use parallel workers; releasing a savepoint keeps a local
+            # setting, so the previous value is put back for the rest of an enclosing block
+            previous = await conn.scalar(_PARALLEL_GATHER_SQL, {"value": "4"})
+            wkb = await conn.scalar(
+                self._stmt(_COVERAGE_UNION_SQL if coverage else _UNION_SQL),
+                {"fids": feature_ids or None}
+            )
+            await conn.execute(_RESTORE_PARALLEL_GATHER_SQL, {"value": previous})
+        return shapely.from_wkb(wkb) if wkb is not None else None
 
 
-    async def nearest_neighbor(self, geom_dict: dict):
+    async def nearest_neighbor(self, geom_dict: dict, candidates: int = 16):
         """
-        Find nearest feature to given geometry
+        Find nearest feature to given geometry with an index-assisted PostGIS KNN query;
+        the closest `candidates` by `<->` are re-ranked by distance in EPSG:32636
         """
-        await self.load_from_db()
-        if self.gdf.empty: 
-            return None
+        geom = shape(geom_dict)
+        geom = geom if shapely.is_valid(geom) else shapely.make_valid(geom)
 
-        def _nearest():
-            geom = shape(geom_dict)
-            geom = make_valid(geom) if not geom.is_valid else geom
-            gdf_proj = self.gdf.to_crs(epsg=32636)
-            geom_proj = gpd.GeoSeries([geom], crs=self.gdf.crs).to_crs(epsg=32636).iloc[0]
-            distances = gdf_proj.geometry.distance(geom_proj)
-            idx = distances.idxmin()
-            row = self.gdf.loc[idx]
-            return {
-                "feature_id": int(row["feature_id"]),
-                "properties": row["properties"],
-                "geometry": row["geometry"].__geo_interface__,
-                "distance_meters": float(distances.loc[idx])
-            }
+        async with self._begin() as conn:
+            row = (await conn.execute(
+                self._stmt(_NEAREST_SQL),
+                {"geom": shapely.to_wkb(geom), "k": candidates}
+            )).first()
 
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(self.executor, _nearest)
+        if row is None:
+            return None
+        return {
+            "feature_id": int(row.feature_id),
+            "properties": _load_properties([row.properties])[0],
+            "geometry": shapely.from_wkb(row.wkb),
+            "distance_meters": float(row.distance)
+        }
 
 
     async def spatial_join(self, other_gdf, how="inner", predicate="intersects"):
         """
-        Perform spatial join with another GeoDataFrame
+        Perform spatial join with another GeoDataFrame; when the layer is not in memory and
+        every match must touch other_gdf's extent (not a left join, not disjoint), only the
+        features whose bbox overlaps that extent are fetched, through the GIST index
         """
-        await self.load_from_db()
-        if self.gdf.empty or other_gdf.empty: 
+        if other_gdf.crs is not None and other_gdf.crs != self.crs:
+            other_gdf = other_gdf.to_crs(self.crs)
+
+        prefilter = how != "left" and predicate != "disjoint"
+        if prefilter and not other_gdf.empty and (self._gdf is None or self._loaded_table != self.features_table):
+            xmin, ymin, xmax, ymax = map(float, other_gdf.total_bounds)
+            async with self._begin() as conn:
+                result = await conn.execute(
+                    self._stmt(_BBOX_SQL), {"xmin": xmin, "ymin": ymin, "xmax": xmax, "ymax": ymax}
+                )
+                layer = self._decode_rows(result.all(), list(result.keys()))
+        else:
+            layer = await self.load_from_db()
+
+        if layer.empty or other_gdf.empty:
             return gpd.GeoDataFrame()
 
         def _join():
-            return gpd.sjoin(self.gdf, other_gdf, how=how, predicate=predicate)
+            return gpd.sjoin(layer, other_gdf, how=how, predicate=predicate)
 
         loop = asyncio.get_running_loop()
         return await loop.run_in_executor(self.executor, _join)
@@ -431,29 +1310,26 @@ class GISManager:
         """
         Retrieve analysis results
         """
-        query = f"SELECT * FROM {self.results_table} WHERE 1=1"
-        if result_id: 
-            query += f" AND result_id = {result_id}"
-        if operation_type: 
-            query += f" AND operation_type = '{operation_type}'"
-        query += " ORDER BY created_at DESC"
-
-        def _load_results():
-            try:
-                return gpd.read_postgis(query, self.sync_engine, geom_col="geometry")
-            except:
-                return gpd.GeoDataFrame()
-
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(self.executor, _load_results)
+        # one bound statement for every filter combination, so the plan can be reused
+        # and operation_type is never spliced into the sql
+        params = {"rid": result_id or None, "op": operation_type or None}
+
+        try:
+            async with self._begin() as conn:
+                columns = await self._select_columns(conn, self.results_table)
+                query = self._stmt(_ANALYSIS_RESULTS_SQL, self.results_table, columns=columns)
+                result = await conn.execute(query, params)
+                return self._decode_rows(result.all(), list(result.keys()))
+        except Exception:
+            return gpd.GeoDataFrame()
 
 
     async def delete_analysis_result(self, result_id: int):
         """
         Delete an analysis result
         """
-        async with self.async_engine.begin() as conn:
+        async with self._begin() as conn:
             result = await conn.execute(
-                text(f"DELETE FROM {self.results_table} WHERE result_id = :id"), {"id": result_id}
+                self._stmt(_DELETE_RESULT_SQL, self.results_table), {"id": result_id}
             )
             return result.rowcount > 0
\ No newline at end of file
@@ -1,14 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 from app.api.routes.gis_router import feature_router, analysis_router
 from app.core.gis_manager import GISManager
+from app.api.deps import RWLock
 
-app = FastAPI(title="GIS Backend")
 
-gis = GISManager()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.gis = GISManager()
+    app.state.gis_lock = RWLock()
+    await app.state.gis.tables_exist()
+    await app.state.gis.check_postgis()
+    await app.state.gis.listen_for_changes()
+    yield
+    await app.state.gis.close()
 
-@app.on_event("startup")
-async def startup_event():
-    await gis.tables_exist()
+
+app = FastAPI(title="GIS Backend", lifespan=lifespan)
+
+# coordinate-heavy geojson compresses well; level 1 keeps the cpu cost low
+app.add_middleware(GZipMiddleware, minimum_size=2048, compresslevel=1)
 
 app.include_router(feature_router)
 app.include_router(analysis_router)
@@ -1,20 +1,46 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 class AnalysisResultCreate(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     operation_type: str = Field(...)
     source_feature_ids: Optional[List[int]] = Field(default=None)
     parameters: Dict[str, Any]
 
 
 class AnalysisResultResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     result_id: int
     operation_type: str
     source_feature_ids: Optional[list[int]]
     parameters: Dict[str, Any]
     feature_count: int
 
-    class Config:
-        from_attributes = True
 
+
+class BufferResponse(BaseModel):
+    status: str = "success"
+    operation: str = "buffer"
+    distance: float
+    feature_id: Optional[int] = None
+    result_id: str
+    count: int
+
+
+class SimplifyResponse(BaseModel):
+    status: str = "success"
+    operation: str = "simplify"
+    tolerance: float
+    result_id: str
+    count: int
+
+
+class DissolveResponse(BaseModel):
+    status: str = "success"
+    operation: str = "dissolve"
+    attribute: str
+    result_id: str
+    count: int
@@ -1,37 +1,82 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Dict, Any
 
 
 class FeatureCreate(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     geometry: Dict[str, Any]
     properties: Dict[str, Any] = Field(default_factory=dict)
     fix_topology: bool = False 
 
 
 class FeatureUpdate(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     geometry: Optional[Dict[str, Any]] = None
     properties: Optional[Dict[str, Any]] = None
     fix_topology: bool = False
 
 
+class FeatureBatchUpdate(FeatureUpdate):
+    feature_id: int
+
+
+class BatchOps(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+    adds: List[FeatureCreate] = Field(default_factory=list)
+    updates: List[FeatureBatchUpdate] = Field(default_factory=list)
+    deletes: List[int] = Field(default_factory=list)
+
+
 class BufferRequest(BaseModel):
-    distance: float
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+    distance: float  # meters
     feature_id: Optional[int] = None 
 
 
 class GeometryRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     geometry: Dict[str, Any]
 
 
 class SimplifyRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     tolerance: float
     simplify_coverage: bool = True
     simplify_boundary: bool = True
 
 
 class DissolveRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     by: str
+    coverage: bool = False  # polygons form a coverage (no overlaps, shared edges match)
 
 
 class UnionRequest(BaseModel):
-    feature_ids: Optional[List[int]] = None  
\ No newline at end of file
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+    feature_ids: Optional[List[int]] = None  
+    coverage: bool = False  # polygons form a coverage (no overlaps, shared edges match)
+
+class UploadResponse(BaseModel):
+    status: str = "success"
+    count: int
+    message: str = "Dataset uploaded successfully."
+
+
+class FeatureResponse(BaseModel):
+    status: str = "success"
+    feature_id: int
+
+
+class BatchResponse(BaseModel):
+    status: str = "success"
+    added: List[int]
+    updated: int
+    deleted: int